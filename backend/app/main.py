@@ -1,9 +1,12 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from app.utils import extract_audio, transcribe_audio
+from app.utils import extract_audio, transcribe_audio, scratch_paths, remove_files, atomic_write_bytes
 from app.processor import TextNotesProcessor
 from app.summarizer_logic import keyword_summarize
+import asyncio
 import os
+import uuid
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -39,6 +42,35 @@ async def startup_event():
     print("Server running on : http://localhost:8000")
     print("="*50 + "\n")
 
+TRANSCRIPTION_PATH = "outputs/last_transcription.txt"
+
+# ((inode, mtime_ns, size), text) of the last transcription; re-read only when it changes
+_transcript_cache = (None, "")
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _write_text(path, text):
+    # Atomic so the transcript cache never picks up a truncated or half-written file
+    atomic_write_bytes(path, text.encode("utf-8"))
+
+def _load_last_transcription():
+    """Returns the last transcription, raising FileNotFoundError if none exists yet."""
+    global _transcript_cache
+    st = os.stat(TRANSCRIPTION_PATH)
+    # os.replace always installs a new inode, so this changes even when two writes
+    # land within the same coarse mtime tick
+    signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached_signature, text = _transcript_cache
+    if signature != cached_signature:
+        # fstat the descriptor we read from, so the stored signature matches the text
+        with open(TRANSCRIPTION_PATH, "r", encoding="utf-8") as f:
+            st = os.fstat(f.fileno())
+            text = f.read()
+        _transcript_cache = ((st.st_ino, st.st_mtime_ns, st.st_size), text)
+    return text
+
 @app.get("/")
 def home():
     return {"message": "Video-to-Summary API is running!"}
@@ -51,16 +83,25 @@ async def summarize_video(video: UploadFile = File(...)):
     try:
         print(f"Processing video: {video.filename}")
 
+        # Requests now run concurrently, so every scratch/output file gets a unique prefix
+        job_id = uuid.uuid4().hex
+
         # Step 1: Extract & Transcribe (Using Groq Whisper now)
-        audio_path = extract_audio(video)
-        transcribed_text = transcribe_audio(audio_path)
+        # Blocking work runs on worker threads so the event loop keeps serving other uploads
+        try:
+            audio_path = await asyncio.to_thread(extract_audio, video, job_id)
+            transcribed_text = await asyncio.to_thread(transcribe_audio, audio_path)
+        finally:
+            # The upload and WAV are never read again (transcripts are cached by content hash)
+            await asyncio.to_thread(remove_files, *scratch_paths(video.filename, job_id))
 
         # Step 2: Processing
-        output_json_path = f"outputs/{video.filename}.json"
+        output_json_path = f"outputs/{job_id}_{Path(video.filename).name}.json"
         os.makedirs("outputs", exist_ok=True)
 
         # We pass generate_mindmap=True to keep feature parity
-        summary_result = processor.process_text(
+        summary_result = await asyncio.to_thread(
+            processor.process_text,
             raw_text=transcribed_text,
             output_json_path=output_json_path,
             generate_mindmap=True
@@ -72,14 +113,12 @@ async def summarize_video(video: UploadFile = File(...)):
         # --- ADD THIS MISSING BLOCK ---
         mindmap_code = ""
         if os.path.exists(mindmap_path):
-            with open(mindmap_path, "r", encoding="utf-8") as f:
-                mindmap_code = f.read()
+            mindmap_code = await asyncio.to_thread(_read_text, mindmap_path)
         # ------------------------------
 
         # Save transcribed text for future keyword searches
         try:
-            with open("outputs/last_transcription.txt", "w", encoding="utf-8") as f:
-                f.write(transcribed_text)
+            await asyncio.to_thread(_write_text, TRANSCRIPTION_PATH, transcribed_text)
         except Exception as e:
             print(f"Failed to save transcription: {e}")
 
@@ -98,15 +137,12 @@ async def summarize_video(video: UploadFile = File(...)):
 @app.get("/keyword_summarize")
 def keyword_summarize_endpoint(q: str):
     """Handles targeted keyword search within the last processed video."""
-    transcription_path = "outputs/last_transcription.txt"
-    
-    if not os.path.exists(transcription_path):
+    try:
+        text = _load_last_transcription()
+    except FileNotFoundError:
         raise HTTPException(status_code=400, detail="No video has been processed yet.")
 
     try:
-        with open(transcription_path, "r", encoding="utf-8") as f:
-            text = f.read()
-        
         # We pass the global groq_api_key
         return keyword_summarize(text=text, keyword=q, api_key=groq_api_key)
     except Exception as e:
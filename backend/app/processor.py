@@ -1,67 +1,232 @@
-import json
+import hashlib
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
+import orjson
 from groq import Groq
+from app.utils import atomic_write_bytes, write_bytes
+
+MODEL_ID = "llama-3.3-70b-versatile"
+
+# Upper bound on concurrent Groq requests issued by a single process_text call
+MAX_WORKERS = 8
+
+# Concurrent batches can trip Groq's rate limit; the SDK retries 429s with
+# exponential backoff (honouring Retry-After) up to this many times
+MAX_RETRIES = 5
+
+# Segments summarized per Groq request; keeps each batched prompt well inside the context window
+BATCH_SIZE = 8
+
+# Terminal punctuation followed by whitespace (or end of text) marks a sentence end
+_SENTENCE_END_RE = re.compile(r"[.!?]+(?=\s|$)")
+
+# Markdown fence the model sometimes wraps around the Mermaid code
+_MERMAID_FENCE_RE = re.compile(r"^```(?:mermaid)?\s*|\s*```$")
+
+# Groq responses keyed by sha256(model + prompt), so repeated segments skip the API
+PROMPT_CACHE_DIR = "outputs/.prompt_cache"
+
+# Whole process_text results keyed by blake2b(pipeline settings + raw_text), so re-uploads skip the pipeline
+RESULT_CACHE_DIR = "outputs/.ptcache"
+
+# Static prompt text is built once; only the transcript-dependent tail varies per call,
+# which keeps the request prefix identical across calls
+_NOTES_KEYS = """- topic: Brief title
+- summary: Concise summary
+- key_points: List of 3-5 bullet points
+- keywords: List of 5 keywords
+"""
+_NOTES_PROMPT_PREFIX = (
+    "Analyze this transcript segment and return valid JSON with these keys:\n"
+    + _NOTES_KEYS + "\nText: "
+)
+_BATCH_PROMPT_PREFIX = (
+    'Analyze each transcript segment below and return valid JSON of the form {"segments": [...]}.\n'
+    "The array must contain one object per segment, in segment order, each with these keys:\n"
+    + _NOTES_KEYS + "\n"
+)
+_MINDMAP_PROMPT_SUFFIX = "\nReturn ONLY the code starting with 'mindmap' and 'root((...))'. No markdown."
+
+# Returned for a segment whose Groq call failed; such results are never cached
+_FALLBACK_NOTES = {"topic": "Segment", "summary": "", "key_points": [], "keywords": []}
+
+# Bump when process_text changes in a way the prompts/settings below don't capture
+# (e.g. segmentation), so stale whole-result cache entries are not served
+RESULT_CACHE_VERSION = 1
+
+# Everything besides the transcript that determines a process_text result
+_RESULT_CACHE_SALT = "\0".join([
+    str(RESULT_CACHE_VERSION), MODEL_ID, str(BATCH_SIZE),
+    _NOTES_PROMPT_PREFIX, _BATCH_PROMPT_PREFIX, _MINDMAP_PROMPT_SUFFIX,
+]).encode("utf-8")
 
 class TextNotesProcessor:
     def __init__(self, groq_api_key: str, use_pegasus: bool = False):
-        self.client = Groq(api_key=groq_api_key)
+        self.client = Groq(api_key=groq_api_key, max_retries=MAX_RETRIES)
+        os.makedirs(PROMPT_CACHE_DIR, exist_ok=True)
+        os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+
+    def _cache_key(self, prompt: str) -> str:
+        return hashlib.sha256((MODEL_ID + prompt).encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str, cache_dir: str = PROMPT_CACHE_DIR, expected_type: type = dict):
+        """Returns the cached value for key, or None on a miss or a malformed entry."""
+        try:
+            with open(os.path.join(cache_dir, f"{key}.json"), "rb") as f:
+                value = orjson.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        return value if isinstance(value, expected_type) else None
+
+    def _cache_put(self, key: str, value, cache_dir: str = PROMPT_CACHE_DIR) -> None:
+        try:
+            atomic_write_bytes(os.path.join(cache_dir, f"{key}.json"), orjson.dumps(value))
+        except OSError as e:
+            print(f"Cache write failed: {e}")
 
     def segment_text(self, text: str, chunk_size: int = 4000) -> List[str]:
-        """Simple segmentation by character limit to avoid token overflow."""
-        return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+        """Greedily packs whole sentences into segments of at most chunk_size characters."""
+        ends = [m.end() for m in _SENTENCE_END_RE.finditer(text)]
+        if not ends or ends[-1] != len(text):
+            ends.append(len(text))
+
+        segments = []
+        start = prev = 0
+        for end in ends:
+            if end - start > chunk_size and prev > start:
+                segments.append(text[start:prev])
+                start = prev
+            # A single sentence longer than chunk_size is split by characters
+            while end - start > chunk_size:
+                segments.append(text[start:start+chunk_size])
+                start += chunk_size
+            prev = end
+        segments.append(text[start:])
+
+        return [seg.strip() for seg in segments if seg.strip()]
+
+    def _notes_prompt(self, segment: str) -> str:
+        return _NOTES_PROMPT_PREFIX + segment[:3000] + "\nReturn ONLY JSON."
 
     def generate_structured_notes(self, segment: str) -> Dict:
         """Uses Groq to generate the summary and keywords."""
-        prompt = f"""Analyze this transcript segment and return valid JSON with these keys:
-- topic: Brief title
-- summary: Concise summary
-- key_points: List of 3-5 bullet points
-- keywords: List of 5 keywords
+        prompt = self._notes_prompt(segment)
+
+        key = self._cache_key(prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
 
-Text: {segment[:3000]}
-Return ONLY JSON."""
-        
         try:
             response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+                model=MODEL_ID,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3,
                 response_format={"type": "json_object"}
             )
-            return json.loads(response.choices[0].message.content)
+            notes = orjson.loads(response.choices[0].message.content)
+            if not isinstance(notes, dict):
+                raise ValueError("expected a JSON object")
+            self._cache_put(key, notes)
+            return notes
         except Exception:
-            return {"topic": "Segment", "summary": "", "key_points": [], "keywords": []}
+            return dict(_FALLBACK_NOTES)
+
+    def generate_structured_notes_batch(self, segments: List[str]) -> List[Dict]:
+        """Summarizes several segments in one Groq call, falling back to per-segment calls."""
+        keys = [self._cache_key(self._notes_prompt(seg)) for seg in segments]
+        results = [self._cache_get(key) for key in keys]
+        missing = [i for i, notes in enumerate(results) if notes is None]
+
+        if len(missing) <= 1:
+            for i in missing:
+                results[i] = self.generate_structured_notes(segments[i])
+            return results
+
+        parts = "\n\n".join(
+            f"[Segment {n}]\n{segments[i][:3000]}" for n, i in enumerate(missing, 1)
+        )
+        prompt = (
+            _BATCH_PROMPT_PREFIX + parts
+            + f"\n\nThe array must contain exactly {len(missing)} objects.\nReturn ONLY JSON."
+        )
 
-    def generate_mindmap(self, concept: str, output_file: str) -> str:
-        """Generates Mermaid.js code using Groq."""
-        prompt = f"""Create a Mermaid mindmap for: "{concept}".
-Return ONLY the code starting with 'mindmap' and 'root((...))'. No markdown."""
-        
         try:
             response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+                model=MODEL_ID,
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
+                temperature=0.3,
+                response_format={"type": "json_object"}
             )
-            code = response.choices[0].message.content.replace("```mermaid", "").replace("```", "").strip()
-            
-            with open(output_file, 'w') as f:
-                f.write(code)
+            batch = orjson.loads(response.choices[0].message.content)["segments"]
+            if not isinstance(batch, list) or len(batch) != len(missing):
+                raise ValueError("segment count mismatch")
+            if not all(isinstance(notes, dict) for notes in batch):
+                raise ValueError("segment entries must be JSON objects")
+        except Exception:
+            for i in missing:
+                results[i] = self.generate_structured_notes(segments[i])
+            return results
+
+        for i, notes in zip(missing, batch):
+            self._cache_put(keys[i], notes)
+            results[i] = notes
+        return results
+
+    def generate_mindmap(self, concept: str, output_file: str) -> str:
+        """Generates Mermaid.js code using Groq."""
+        prompt = f'Create a Mermaid mindmap for: "{concept}".' + _MINDMAP_PROMPT_SUFFIX
+
+        try:
+            key = self._cache_key(prompt)
+            code = self._cache_get(key, expected_type=str)
+            if code is None:
+                response = self.client.chat.completions.create(
+                    model=MODEL_ID,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.3
+                )
+                code = _MERMAID_FENCE_RE.sub("", response.choices[0].message.content.strip()).strip()
+                self._cache_put(key, code)
+
+            write_bytes(output_file, code.encode("utf-8"))
             return code
         except Exception as e:
             print(f"Mindmap generation failed: {e}")
             return ""
 
+    def _save_outputs(self, final_output: Dict, output_json_path: str, mindmap_code: str = None) -> None:
+        write_bytes(output_json_path, orjson.dumps(final_output, option=orjson.OPT_INDENT_2))
+        if mindmap_code is not None:
+            write_bytes(output_json_path.replace('.json', '_mindmap.mmd'), mindmap_code.encode("utf-8"))
+
     def process_text(self, raw_text: str, output_json_path: str = None, generate_mindmap: bool = True, **kwargs) -> Dict:
+        wants_mindmap = bool(output_json_path) and generate_mindmap
+
+        # 0. Identical transcripts reuse the previous result, mindmap included
+        result_key = hashlib.blake2b(_RESULT_CACHE_SALT + b"\0" + raw_text.encode("utf-8")).hexdigest()
+        cached = self._cache_get(result_key, RESULT_CACHE_DIR)
+        if cached is not None and (cached["mindmap"] or not wants_mindmap):
+            if output_json_path:
+                self._save_outputs(cached["output"], output_json_path, cached["mindmap"] if wants_mindmap else None)
+            return cached["output"]
+
         # 1. Simple processing
         segments = self.segment_text(raw_text)
-        structured_segments = [self.generate_structured_notes(seg) for seg in segments]
+
+        # Segments are sent BATCH_SIZE at a time and the batches run concurrently.
+        # ex.map preserves input order.
+        batches = [segments[i:i+BATCH_SIZE] for i in range(0, len(segments), BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=max(1, min(len(batches), MAX_WORKERS))) as ex:
+            structured_segments = [
+                notes for batch in ex.map(self.generate_structured_notes_batch, batches) for notes in batch
+            ]
 
         # 2. Aggregate Results
-        overall_summary = " ".join([s.get('summary', '') for s in structured_segments])
+        overall_summary = " ".join(s.get('summary', '') for s in structured_segments)
         
         final_output = {
             "overall_summary": overall_summary,
@@ -69,15 +234,24 @@ Return ONLY the code starting with 'mindmap' and 'root((...))'. No markdown."""
             "metadata": {"pipeline": "Lightweight Groq"}
         }
 
-        # 3. Save JSON
+        mindmap_code = None
         if output_json_path:
-            with open(output_json_path, 'w') as f:
-                json.dump(final_output, f, indent=2)
+            with ThreadPoolExecutor(max_workers=1) as ex:
+                # 3. Generate Mindmap (Restored for Frontend compatibility)
+                # Started first so the LLM round-trip overlaps with the JSON write.
+                if wants_mindmap:
+                    mindmap_path = output_json_path.replace('.json', '_mindmap.mmd')
+                    topic_str = ", ".join(s.get('topic', '') for s in structured_segments)
+                    mindmap_future = ex.submit(self.generate_mindmap, f"Summary of: {topic_str}", mindmap_path)
+
+                # 4. Save JSON
+                self._save_outputs(final_output, output_json_path)
+
+            if wants_mindmap:
+                mindmap_code = mindmap_future.result()
 
-            # 4. Generate Mindmap (Restored for Frontend compatibility)
-            if generate_mindmap:
-                mindmap_path = output_json_path.replace('.json', '_mindmap.mmd')
-                topic_str = ", ".join([s.get('topic', '') for s in structured_segments])
-                self.generate_mindmap(f"Summary of: {topic_str}", mindmap_path)
+        # 5. Cache only complete results so failed calls are retried next time
+        if _FALLBACK_NOTES not in structured_segments and mindmap_code != "":
+            self._cache_put(result_key, {"output": final_output, "mindmap": mindmap_code}, RESULT_CACHE_DIR)
 
-        return final_output
\ No newline at end of file
+        return final_output
@@ -1,19 +1,70 @@
-import json
+import functools
 import re
+import orjson
 from groq import Groq
 
 # Large model is preferred for better reasoning & extraction
 MODEL_ID = "llama-3.3-70b-versatile"
 
+# Markdown code fences the model sometimes wraps around its JSON
+_JSON_FENCE_RE = re.compile(r"^```json|```$")
 
+# Transcripts longer than this are narrowed to the passages around the keyword
+MAX_CONTEXT_CHARS = 12000
+# Sentences kept on each side of a sentence that mentions the keyword
+CONTEXT_WINDOW = 2
+# Placed between non-adjacent passages of the narrowed transcript
+PASSAGE_SEPARATOR = "\n...\n"
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@functools.lru_cache(maxsize=16)
 def initialize_groq_client(api_key):
-    # Initialize Groq client using provided API key
+    # Initialize Groq client using provided API key; cached so every request
+    # reuses one client and its pooled keep-alive connections
     try:
         return Groq(api_key=api_key)
     except Exception:
         return None
 
 
+def select_relevant_text(text, keyword):
+    """
+    Keep only the sentences around mentions of the keyword, so long transcripts
+    produce a smaller (faster, cheaper) prompt.
+    Short texts, and texts that never mention the keyword verbatim, are returned unchanged.
+    """
+    if len(text) <= MAX_CONTEXT_CHARS:
+        return text
+
+    sentences = _SENTENCE_SPLIT_RE.split(text)
+    terms = [t for t in keyword.split() if len(t) > 2] or [keyword.strip()]
+    # Whole-word matches (plus simple plurals), so "AI" does not hit "again" or "main"
+    patterns = [re.compile(r"\b" + re.escape(term) + r"(?:s|es)?\b", re.IGNORECASE) for term in terms]
+
+    keep = set()
+    for i, sentence in enumerate(sentences):
+        if any(pattern.search(sentence) for pattern in patterns):
+            keep.update(range(max(0, i - CONTEXT_WINDOW), min(len(sentences), i + CONTEXT_WINDOW + 1)))
+
+    # No literal mention: let the model judge relevance over the full transcript
+    if not keep:
+        return text
+
+    # Join each contiguous run of kept sentences, and mark the gaps between runs so the
+    # model does not read passages from different parts of the talk as one
+    passages = []
+    previous = None
+    for i in sorted(keep):
+        if previous is not None and i == previous + 1:
+            passages[-1].append(sentences[i])
+        else:
+            passages.append([sentences[i]])
+        previous = i
+
+    return PASSAGE_SEPARATOR.join(" ".join(run) for run in passages)
+
+
 def keyword_summarize(text, keyword, api_key):
     """
     Extract and summarize ONLY keyword-related information from text.
@@ -48,7 +99,7 @@ Return ONLY valid JSON with the following fields:
 - related_concepts
 
 Text:
-{text}
+{select_relevant_text(text, keyword)}
 """
 
     try:
@@ -65,7 +116,7 @@ Text:
         raw_output = response.choices[0].message.content.strip()
 
         # Clean up accidental markdown formatting if any
-        raw_output = re.sub(r"^```json|```$", "", raw_output).strip()
+        raw_output = _JSON_FENCE_RE.sub("", raw_output).strip()
 
         return safe_json_parse(raw_output)
 
@@ -76,7 +127,7 @@ Text:
 def safe_json_parse(text):
     # Parse JSON safely, fallback if model response is malformed
     try:
-        return json.loads(text)
+        return orjson.loads(text)
     except Exception:
         return {
             "topic": "Parsing Error",
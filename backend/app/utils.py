@@ -1,42 +1,185 @@
+import functools
+import hashlib
 import os
+import shutil
 import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from groq import Groq
 
 # Define directories for temporary file storage
-UPLOAD_DIR = "uploads"
-AUDIO_DIR = "audio"
+UPLOAD_DIR = Path("uploads")
+AUDIO_DIR = Path("audio")
+
+# Transcripts keyed by blake2b of the audio bytes, so re-uploads skip Whisper
+TRANSCRIPT_CACHE_DIR = Path("outputs/.transcript_cache")
+
+TRANSCRIBE_MODEL = "whisper-large-v3-turbo"
+
+# Cuts every pause longer than 1s (below -50 dB) down to 0.5s, so silence is
+# neither uploaded to nor transcribed by Whisper
+SILENCE_FILTER = "silenceremove=stop_periods=-1:stop_duration=1:stop_threshold=-50dB:stop_silence=0.5"
+
+# Extracted audio is 16 kHz mono pcm_s16le, i.e. 32000 bytes per second
+WAV_BYTES_PER_SECOND = 16000 * 2
+
+# Longer recordings are split into pieces of this length and transcribed concurrently
+CHUNK_SECONDS = 300
+MAX_TRANSCRIBE_WORKERS = 4
+
+# Compressed audio formats Groq's Whisper endpoint accepts as-is; these skip ffmpeg
+DIRECT_AUDIO_EXTENSIONS = {".flac", ".m4a", ".mp3", ".mpga", ".ogg"}
+# Kept under Groq's per-request audio size limit; larger files go through ffmpeg
+# so the resulting WAV gets split into CHUNK_SECONDS pieces
+DIRECT_AUDIO_MAX_BYTES = 24 * 1024 * 1024
+
+# Uploads are copied to disk in fixed-size chunks to keep memory flat for large videos
+UPLOAD_CHUNK_SIZE = 1 << 20
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(AUDIO_DIR, exist_ok=True)
+os.makedirs(TRANSCRIPT_CACHE_DIR, exist_ok=True)
 
-def extract_audio(video_file):
-    """Saves uploaded video and extracts audio using ffmpeg."""
-    video_path = os.path.join(UPLOAD_DIR, video_file.filename)
-    audio_path = os.path.join(AUDIO_DIR, video_file.filename + ".wav")
+def write_bytes(path, data):
+    """Writes data through a raw descriptor, skipping Python's buffered/text IO layers."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def atomic_write_bytes(path, data):
+    """
+    Replaces path with data via a temp file and rename, so concurrent readers see
+    either the old or the new contents, never a partial write. Raises OSError on failure.
+    """
+    tmp_path = f"{os.fspath(path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write_bytes(tmp_path, data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def scratch_paths(filename, job_id):
+    """Returns the (upload, extracted WAV) paths used for one request."""
+    # Keep only the final path component so a client-supplied name cannot escape UPLOAD_DIR,
+    # and prefix the per-request job_id so concurrent uploads of the same name never collide
+    name = f"{job_id}_{Path(filename).name}"
+    return os.fspath(UPLOAD_DIR / name), os.fspath(AUDIO_DIR / f"{name}.wav")
+
+def remove_files(*paths):
+    """Deletes each distinct path, ignoring ones that were never created."""
+    for path in set(paths):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def extract_audio(video_file, job_id):
+    """Saves uploaded video and extracts audio using ffmpeg (audio uploads are used directly)."""
+    video_path, audio_path = scratch_paths(video_file.filename, job_id)
 
     with open(video_path, "wb") as f:
-        f.write(video_file.file.read())
+        shutil.copyfileobj(video_file.file, f, length=UPLOAD_CHUNK_SIZE)
+
+    # Already compact audio small enough for one request: no need to spawn ffmpeg
+    if (
+        Path(video_path).suffix.lower() in DIRECT_AUDIO_EXTENSIONS
+        and os.path.getsize(video_path) <= DIRECT_AUDIO_MAX_BYTES
+    ):
+        return video_path
 
     # Extract audio (keeping 16kHz for compatibility)
-    command = f'ffmpeg -i "{video_path}" -vn -acodec pcm_s16le -ar 16000 -ac 1 "{audio_path}" -y'
-    subprocess.run(command, shell=True)
+    # Exec'd directly with an argv list: no shell fork, and filenames are never shell-parsed
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+        "-i", video_path,
+        "-vn", "-af", SILENCE_FILTER,
+        "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
+        audio_path,
+    ]
+    subprocess.run(command, check=True)
 
     return audio_path
 
+@functools.lru_cache(maxsize=1)
+def _get_groq_client(api_key):
+    # One client per process so transcriptions reuse its pooled keep-alive connections
+    return Groq(api_key=api_key)
+
+def _split_audio(audio_path, out_dir):
+    """Splits a WAV into CHUNK_SECONDS pieces with ffmpeg's segment muxer (no re-encode)."""
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+        "-i", audio_path,
+        "-f", "segment", "-segment_time", str(CHUNK_SECONDS), "-c", "copy",
+        os.path.join(out_dir, "part%03d.wav"),
+    ]
+    subprocess.run(command, check=True)
+    return sorted(os.path.join(out_dir, name) for name in os.listdir(out_dir))
+
+def _audio_digest(audio_path):
+    h = hashlib.blake2b(TRANSCRIBE_MODEL.encode("utf-8"))
+    with open(audio_path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _transcribe_file(client, audio_path):
+    # Pass the open handle so the multipart body is streamed from disk, not buffered
+    with open(audio_path, "rb") as file:
+        # Raw response: the SDK would otherwise try to JSON-decode the plain-text body
+        # (turning "42" into an int, "null" into None, stripping quotes, ...)
+        response = client.audio.transcriptions.with_raw_response.create(
+            file=(Path(audio_path).name, file),
+            model=TRANSCRIBE_MODEL,  # UPDATED: Replaced deprecated model
+            response_format="text",  # Only the text is used, so skip the JSON envelope
+            temperature=0.0
+        )
+
+    return response.http_response.text
+
+def _transcribe_uncached(client, audio_path):
+    if not audio_path.endswith(".wav") or os.path.getsize(audio_path) <= CHUNK_SECONDS * WAV_BYTES_PER_SECOND:
+        return _transcribe_file(client, audio_path)
+
+    # Long recording: transcribe the pieces in parallel and join them in order
+    parts_dir = tempfile.mkdtemp(dir=AUDIO_DIR)
+    try:
+        parts = _split_audio(audio_path, parts_dir)
+        # The muxer wrote nothing (e.g. header-only WAV): send the file as a whole
+        if not parts:
+            return _transcribe_file(client, audio_path)
+        with ThreadPoolExecutor(max_workers=min(len(parts), MAX_TRANSCRIBE_WORKERS)) as ex:
+            texts = list(ex.map(functools.partial(_transcribe_file, client), parts))
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    return " ".join(text.strip() for text in texts)
+
 def transcribe_audio(audio_path):
     """Transcribes audio file using Groq's Whisper API."""
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise ValueError("GROQ_API_KEY not found")
 
-    client = Groq(api_key=api_key)
+    cache_path = TRANSCRIPT_CACHE_DIR / f"{_audio_digest(audio_path)}.txt"
+    if cache_path.exists():
+        return cache_path.read_text(encoding="utf-8")
 
-    with open(audio_path, "rb") as file:
-        transcription = client.audio.transcriptions.create(
-            file=(os.path.basename(audio_path), file.read()),
-            model="whisper-large-v3-turbo",  # UPDATED: Replaced deprecated model
-            response_format="json",
-            temperature=0.0
-        )
-    
-    return transcription.text
\ No newline at end of file
+    text = _transcribe_uncached(_get_groq_client(api_key), audio_path)
+
+    try:
+        atomic_write_bytes(cache_path, text.encode("utf-8"))
+    except OSError as e:
+        print(f"Transcript cache write failed: {e}")
+
+    return text
\ No newline at end of file
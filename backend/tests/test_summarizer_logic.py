@@ -0,0 +1,28 @@
+from app.summarizer_logic import MAX_CONTEXT_CHARS, PASSAGE_SEPARATOR, select_relevant_text
+
+
+def _long_transcript(*mentions):
+    sentences = [f"We said this again in the main part {i}." for i in range(600)]
+    for index, sentence in mentions:
+        sentences[index] = sentence
+    text = " ".join(sentences)
+    assert len(text) > MAX_CONTEXT_CHARS
+    return text
+
+
+def test_short_keyword_matches_whole_words_only():
+    text = _long_transcript((100, "AI models are trained on data."), (400, "Modern AI is everywhere."))
+
+    result = select_relevant_text(text, "AI")
+
+    assert "AI models are trained on data." in result
+    assert "Modern AI is everywhere." in result
+    assert result.count(PASSAGE_SEPARATOR) == 1
+    assert len(result) < len(text) // 10
+
+
+def test_no_mention_returns_full_transcript():
+    text = _long_transcript()
+
+    assert select_relevant_text(text, "AI") == text
+    assert select_relevant_text(text, "art") == text